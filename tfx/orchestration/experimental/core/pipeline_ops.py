@@ -466,6 +466,13 @@ def _orchestrate_stop_initiated_pipeline(
     with pipeline_state:
       # Update pipeline execution state in MLMD.
       pipeline_state.set_pipeline_execution_state_from_status(stop_reason)
+    pipeline = pipeline_state.pipeline
+    if pipeline.execution_mode == pipeline_pb2.Pipeline.SYNC:
+      # Stopped sync pipelines are never finalized by the task generator, so
+      # their cached successful nodes are released here.
+      sync_pipeline_task_gen.clear_successful_nodes_cache(
+          pipeline_state.pipeline_uid,
+          pipeline.runtime_spec.pipeline_run_id.field_value.string_value)
 
 
 def _orchestrate_update_initiated_pipeline(
@@ -457,6 +457,32 @@ class PipelineOpsTest(test_utils.TfxTest, parameterized.TestCase):
            mock.call(mock.ANY, 'Transform')],
           any_order=True)
 
+  def test_orchestrate_stop_initiated_sync_pipeline_clears_cache(self):
+    with self._mlmd_connection as m:
+      pipeline = _test_pipeline('pipeline1', pipeline_pb2.Pipeline.SYNC)
+      pipeline.nodes.add().pipeline_node.node_info.id = 'Trainer'
+      pipeline_uid = task_lib.PipelineUid.from_pipeline(pipeline)
+      cache_key = (pipeline_uid, 'run0')
+
+      mock_service_job_manager = mock.create_autospec(
+          service_jobs.ServiceJobManager, instance=True)
+      mock_service_job_manager.is_pure_service_node.return_value = False
+      mock_service_job_manager.is_mixed_service_node.return_value = False
+
+      pipeline_ops.initiate_pipeline_start(m, pipeline)
+      with pstate.PipelineState.load(m, pipeline_uid) as pipeline_state:
+        pipeline_state.initiate_stop(
+            status_lib.Status(code=status_lib.Code.CANCELLED))
+
+      with mock.patch.object(sync_pipeline_task_gen,
+                             '_successful_nodes_by_run',
+                             {cache_key: {'Trainer'}}):
+        pipeline_ops.orchestrate(m, tq.TaskQueue(), mock_service_job_manager)
+        # The pipeline is stopped without being finalized by the task
+        # generator, so its cached successful nodes must be released.
+        self.assertNotIn(cache_key,
+                         sync_pipeline_task_gen._successful_nodes_by_run)
+
   @parameterized.parameters(
       _test_pipeline('pipeline1'),
       _test_pipeline('pipeline1', pipeline_pb2.Pipeline.SYNC))
@@ -13,10 +13,11 @@
 # limitations under the License.
 """TaskGenerator implementation for sync pipelines."""
 
-from typing import Callable, Hashable, List, Optional, Sequence, Set
+import array
+import sys
+from typing import Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
 
 from absl import logging
-import cachetools
 from tfx.orchestration import data_types_utils
 from tfx.orchestration import metadata
 from tfx.orchestration.experimental.core import constants
@@ -37,7 +38,18 @@ from google.protobuf import any_pb2
 from ml_metadata.proto import metadata_store_pb2
 
 # Caches successful and skipped nodes so we don't have to query MLMD repeatedly.
-_successful_nodes_cache = cachetools.LRUCache(maxsize=1024)
+# Maps (pipeline uid, pipeline run id) to the set of cache keys of successful
+# nodes in that run. Entries are removed once the pipeline run is finalized or
+# stopped; the number of entries is also bounded in case a run is abandoned
+# without either happening, in which case the oldest entries are evicted.
+_successful_nodes_by_run: Dict[Tuple[task_lib.PipelineUid, str], Set[str]] = {}
+_MAX_CACHED_RUNS = 1024
+
+
+def clear_successful_nodes_cache(pipeline_uid: task_lib.PipelineUid,
+                                 pipeline_run_id: str) -> None:
+  """Removes the cached successful nodes of the given pipeline run."""
+  _successful_nodes_by_run.pop((pipeline_uid, pipeline_run_id), None)
 
 
 class SyncPipelineTaskGenerator(task_gen.TaskGenerator):
@@ -69,17 +81,43 @@ class SyncPipelineTaskGenerator(task_gen.TaskGenerator):
           'SyncPipelineTaskGenerator should be instantiated with a pipeline '
           'proto having execution_mode `SYNC`, not `{}`'.format(
               pipeline.execution_mode))
+    # Validates the nodes and precomputes the per-node data needed by
+    # `generate` in a single pass over the pipeline nodes.
+    self._node_by_id: Dict[str, pipeline_pb2.PipelineNode] = {}
+    # Node ids are interned once here and used as keys of the successful nodes
+    # cache, so that all cache entries for a node share a single str.
+    self._interned_node_ids: Dict[str, str] = {}
+    self._upstream_by_node_id: Dict[str, FrozenSet[str]] = {}
+    self._terminal_node_ids: Set[str] = set()
     for node in pipeline.nodes:
       which_node = node.WhichOneof('node')
       if which_node != 'pipeline_node':
         raise ValueError(
             'All sync pipeline nodes should be of type `PipelineNode`; found: '
             '`{}`'.format(which_node))
+      pipeline_node = node.pipeline_node
+      node_id = sys.intern(pipeline_node.node_info.id)
+      self._node_by_id[node_id] = pipeline_node
+      self._interned_node_ids[node_id] = node_id
+      self._upstream_by_node_id[node_id] = frozenset(
+          pipeline_node.upstream_nodes)
+      if not pipeline_node.downstream_nodes:
+        self._terminal_node_ids.add(node_id)
+    if len(self._node_by_id) != len(pipeline.nodes):
+      raise ValueError('Sync pipeline nodes must have unique ids.')
+    # The pipeline IR doesn't change for the lifetime of the generator, so the
+    # topological layering is computed only once.
+    self._layers = _topsorted_layers(self._node_by_id,
+                                     self._upstream_by_node_id)
+    # Unpacking the deployment config is expensive, so it is deferred until an
+    # executor spec is first needed and then done only once.
+    self._executor_specs: Optional[Dict[str, any_pb2.Any]] = None
     self._pipeline_state = pipeline_state
     self._pipeline_uid = self._pipeline_state.pipeline_uid
     self._pipeline = pipeline
     self._pipeline_run_id = (
         pipeline.runtime_spec.pipeline_run_id.field_value.string_value)
+    self._run_cache_key = (self._pipeline_uid, self._pipeline_run_id)
     self._is_task_id_tracked_fn = is_task_id_tracked_fn
     self._service_job_manager = service_job_manager
 
@@ -92,70 +130,134 @@ class SyncPipelineTaskGenerator(task_gen.TaskGenerator):
     Returns:
       A `list` of tasks to execute.
     """
-    layers = _topsorted_layers(self._pipeline)
-    terminal_node_ids = _terminal_node_ids(layers)
+    (update_node_state_tasks, exec_node_tasks, finalize_pipeline_task,
+     successful_node_ids) = self._generate_tasks()
+    result = update_node_state_tasks
+    if finalize_pipeline_task:
+      result.append(finalize_pipeline_task)
+      self._clear_successful_nodes_cache()
+    elif self._terminal_node_ids <= successful_node_ids:
+      # If all terminal nodes are successful, the pipeline can be finalized.
+      result.append(
+          task_lib.FinalizePipelineTask(
+              pipeline_uid=self._pipeline_uid,
+              status=status_lib.Status(code=status_lib.Code.OK)))
+      self._clear_successful_nodes_cache()
+    else:
+      result.extend(exec_node_tasks)
+    return result
+
+  def _generate_tasks(
+      self
+  ) -> Tuple[List[task_lib.Task], List[task_lib.Task],
+             Optional[task_lib.Task], Set[str]]:
+    """Generates tasks for the pipeline nodes, layer by layer.
+
+    Task generation stops as soon as a node generates a `FinalizePipelineTask`.
+
+    Returns:
+      A tuple of update node state tasks, exec node tasks, the finalize pipeline
+      task (`None` if not generated) and the set of successful node ids.
+    """
     exec_node_tasks = []
     update_node_state_tasks = []
     successful_node_ids = set()
-    finalize_pipeline_task = None
-    for layer_nodes in layers:
+    # Task types are bound locally to keep the per-task dispatch cheap.
+    update_node_state_task_type = task_lib.UpdateNodeStateTask
+    exec_node_task_type = task_lib.ExecNodeTask
+    for layer_nodes in self._layers:
+      # Nodes known to be successful and nodes whose upstream nodes are not all
+      # successful yet generate no tasks, so their states are not needed. Nodes
+      # in the same layer never depend on each other.
+      pending_nodes = []
       for node in layer_nodes:
-        tasks = self._generate_tasks_for_node(node, successful_node_ids)
+        node_uid = task_lib.NodeUid.from_pipeline_node(self._pipeline, node)
+        if self._in_successful_nodes_cache(node_uid.node_id):
+          successful_node_ids.add(node.node_info.id)
+        elif self._upstream_nodes_successful(node, successful_node_ids):
+          pending_nodes.append((node, node_uid))
+      if not pending_nodes:
+        continue
+
+      # Read the states of the pending nodes in the layer within a single
+      # pipeline state context rather than entering the context once per node.
+      with self._pipeline_state:
+        node_states = {
+            node_uid.node_id: self._pipeline_state.get_node_state(node_uid)
+            for _, node_uid in pending_nodes
+        }
+      # Generate the tasks that don't depend on executions first, so that the
+      # executions of the remaining nodes can be fetched in a single batch.
+      node_tasks = []
+      nodes_needing_executions = []
+      for node, node_uid in pending_nodes:
+        tasks = self._generate_tasks_without_executions(
+            node, node_uid, node_states[node_uid.node_id], successful_node_ids)
+        node_tasks.append((node, node_uid, tasks))
+        if tasks is None:
+          nodes_needing_executions.append(node)
+        elif tasks and type(tasks[-1]) is task_lib.FinalizePipelineTask:
+          # The remaining nodes in the layer need not be considered.
+          break
+      executions_by_node_id = task_gen_utils.get_executions_for_nodes(
+          self._mlmd_handle, nodes_needing_executions)
+
+      successful_layer_node_ids = []
+      for node, node_uid, tasks in node_tasks:
+        node_id = node.node_info.id
+        if tasks is None:
+          tasks = self._generate_tasks_from_executions(
+              node, node_uid, node_states[node_id],
+              executions_by_node_id[node_id], successful_node_ids)
+        if node_id in successful_node_ids:
+          successful_layer_node_ids.append(node_id)
         for task in tasks:
-          if task_lib.is_update_node_state_task(task):
+          task_type = type(task)
+          if task_type is update_node_state_task_type:
             update_node_state_tasks.append(task)
-          elif task_lib.is_exec_node_task(task):
+          elif task_type is exec_node_task_type:
             exec_node_tasks.append(task)
           else:
-            assert task_lib.is_finalize_pipeline_task(task)
-            finalize_pipeline_task = task
+            assert task_type is task_lib.FinalizePipelineTask
+            # A finalize pipeline task is always the last generated task.
+            return (update_node_state_tasks, exec_node_tasks, task,
+                    successful_node_ids)
 
-        if finalize_pipeline_task:
-          break
+      self._update_successful_nodes_cache(successful_layer_node_ids)
 
-      if finalize_pipeline_task:
-        break
+    return (update_node_state_tasks, exec_node_tasks, None,
+            successful_node_ids)
 
-      layer_node_ids = set(node.node_info.id for node in layer_nodes)
-      successful_layer_node_ids = layer_node_ids & successful_node_ids
-      self._update_successful_nodes_cache(successful_layer_node_ids)
+  def _generate_tasks_without_executions(
+      self, node: pipeline_pb2.PipelineNode, node_uid: task_lib.NodeUid,
+      node_state: pstate.NodeState,
+      successful_node_ids: Set[str]) -> Optional[List[task_lib.Task]]:
+    """Generates the tasks for the given node that don't need its executions.
 
-    result = update_node_state_tasks
-    if finalize_pipeline_task:
-      result.append(finalize_pipeline_task)
-    elif terminal_node_ids <= successful_node_ids:
-      # If all terminal nodes are successful, the pipeline can be finalized.
-      result.append(
-          task_lib.FinalizePipelineTask(
-              pipeline_uid=self._pipeline_uid,
-              status=status_lib.Status(code=status_lib.Code.OK)))
-    else:
-      result.extend(exec_node_tasks)
-    return result
+    The node must not be known to be successful, and all its upstream nodes
+    must be successful.
 
-  def _generate_tasks_for_node(
-      self, node: pipeline_pb2.PipelineNode,
-      successful_node_ids: Set[str]) -> List[task_lib.Task]:
-    """Generates list of tasks for the given node."""
-    node_uid = task_lib.NodeUid.from_pipeline_node(self._pipeline, node)
+    Args:
+      node: The pipeline node.
+      node_uid: The uid of the node.
+      node_state: The current state of the node.
+      successful_node_ids: Ids of the nodes known to be successful. Updated
+        with the node's id if the node is found to be successful.
+
+    Returns:
+      The list of generated tasks, or `None` if the tasks for the node depend
+      on its executions and must be generated by
+      `_generate_tasks_from_executions`.
+    """
     node_id = node.node_info.id
     result = []
 
-    if self._in_successful_nodes_cache(node_uid):
-      successful_node_ids.add(node_id)
-      return result
-
-    if not self._upstream_nodes_successful(node, successful_node_ids):
+    if node_state.state in (pstate.NodeState.STOPPING,
+                            pstate.NodeState.STOPPED):
+      logging.info('Ignoring node in state \'%s\' for task generation: %s',
+                   node_state.state, node_uid)
       return result
 
-    with self._pipeline_state:
-      node_state = self._pipeline_state.get_node_state(node_uid)
-      if node_state.state in (pstate.NodeState.STOPPING,
-                              pstate.NodeState.STOPPED):
-        logging.info('Ignoring node in state \'%s\' for task generation: %s',
-                     node_state.state, node_uid)
-        return result
-
     # If this is a pure service node, there is no ExecNodeTask to generate
     # but we ensure node services and check service status.
     service_status = self._ensure_node_services_if_pure(node_id)
@@ -198,7 +300,31 @@ class SyncPipelineTaskGenerator(task_gen.TaskGenerator):
         result.append(self._abort_task(error_msg))
       return result
 
-    node_executions = task_gen_utils.get_executions(self._mlmd_handle, node)
+    return None
+
+  def _generate_tasks_from_executions(
+      self, node: pipeline_pb2.PipelineNode, node_uid: task_lib.NodeUid,
+      node_state: pstate.NodeState,
+      node_executions: Sequence[metadata_store_pb2.Execution],
+      successful_node_ids: Set[str]) -> List[task_lib.Task]:
+    """Generates the tasks for the given node based on its executions.
+
+    Only called for nodes for which `_generate_tasks_without_executions`
+    returned `None`.
+
+    Args:
+      node: The pipeline node.
+      node_uid: The uid of the node.
+      node_state: The current state of the node.
+      node_executions: The executions of the node.
+      successful_node_ids: Ids of the nodes known to be successful. Updated
+        with the node's id if the node is found to be successful.
+
+    Returns:
+      The list of generated tasks.
+    """
+    node_id = node.node_info.id
+    result = []
     latest_execution = task_gen_utils.get_latest_execution(node_executions)
 
     # If the latest execution is successful, we're done.
@@ -291,7 +417,7 @@ class SyncPipelineTaskGenerator(task_gen.TaskGenerator):
         self._mlmd_handle,
         pipeline_node=node,
         pipeline_info=self._pipeline.pipeline_info,
-        executor_spec=_get_executor_spec(self._pipeline, node.node_info.id),
+        executor_spec=self._get_executor_spec(node.node_info.id),
         input_artifacts=resolved_info.input_artifacts,
         output_artifacts=output_artifacts,
         parameters=resolved_info.exec_properties)
@@ -348,6 +474,14 @@ class SyncPipelineTaskGenerator(task_gen.TaskGenerator):
             pipeline=self._pipeline))
     return result
 
+  # TODO(b/182944474): Raise error in _get_executor_spec if executor spec is
+  # missing for a non-system node.
+  def _get_executor_spec(self, node_id: str) -> Optional[any_pb2.Any]:
+    """Returns executor spec for given node_id if it exists in pipeline IR, None otherwise."""
+    if self._executor_specs is None:
+      self._executor_specs = _get_executor_specs(self._pipeline)
+    return self._executor_specs.get(node_id)
+
   def _ensure_node_services_if_pure(
       self, node_id: str) -> Optional[service_jobs.ServiceStatus]:
     """Calls `ensure_node_services` and returns status if given node is pure service node."""
@@ -369,7 +503,7 @@ class SyncPipelineTaskGenerator(task_gen.TaskGenerator):
   def _upstream_nodes_successful(self, node: pipeline_pb2.PipelineNode,
                                  successful_node_ids: Set[str]) -> bool:
     """Returns `True` if all the upstream nodes have been successfully executed."""
-    return set(node.upstream_nodes) <= successful_node_ids
+    return self._upstream_by_node_id[node.node_info.id] <= successful_node_ids
 
   def _abort_task(self, error_msg: str) -> task_lib.FinalizePipelineTask:
     """Returns task to abort pipeline execution."""
@@ -381,54 +515,88 @@ class SyncPipelineTaskGenerator(task_gen.TaskGenerator):
         status=status_lib.Status(
             code=status_lib.Code.ABORTED, message=error_msg))
 
-  def _update_successful_nodes_cache(self, node_ids: Set[str]) -> None:
-    for node_id in node_ids:
-      node_uid = task_lib.NodeUid(
-          pipeline_uid=self._pipeline_uid, node_id=node_id)
-      _successful_nodes_cache[self._node_cache_key(node_uid)] = True
-
-  def _in_successful_nodes_cache(self, node_uid) -> bool:
-    return _successful_nodes_cache.get(self._node_cache_key(node_uid), False)
-
-  def _node_cache_key(self, node_uid: task_lib.NodeUid) -> Hashable:
-    return (self._pipeline_run_id, node_uid)
-
-
-# TODO(b/182944474): Raise error in _get_executor_spec if executor spec is
-# missing for a non-system node.
-def _get_executor_spec(pipeline: pipeline_pb2.Pipeline,
-                       node_id: str) -> Optional[any_pb2.Any]:
-  """Returns executor spec for given node_id if it exists in pipeline IR, None otherwise."""
+  def _update_successful_nodes_cache(self, node_ids: Iterable[str]) -> None:
+    node_ids = list(node_ids)
+    if not node_ids:
+      return
+    if self._run_cache_key not in _successful_nodes_by_run:
+      while len(_successful_nodes_by_run) >= _MAX_CACHED_RUNS:
+        # Dicts preserve insertion order, so this evicts the oldest run.
+        del _successful_nodes_by_run[next(iter(_successful_nodes_by_run))]
+      _successful_nodes_by_run[self._run_cache_key] = set()
+    _successful_nodes_by_run[self._run_cache_key].update(
+        self._interned_node_ids[node_id] for node_id in node_ids)
+
+  def _in_successful_nodes_cache(self, node_id: str) -> bool:
+    # The cache is partitioned by pipeline uid and run id, so the node id is
+    # sufficient as a key.
+    return node_id in _successful_nodes_by_run.get(self._run_cache_key, ())
+
+  def _clear_successful_nodes_cache(self) -> None:
+    clear_successful_nodes_cache(self._pipeline_uid, self._pipeline_run_id)
+
+
+def _get_executor_specs(
+    pipeline: pipeline_pb2.Pipeline) -> Dict[str, any_pb2.Any]:
+  """Returns executor specs by node id if they exist in pipeline IR, empty dict otherwise."""
   if not pipeline.deployment_config.Is(
       pipeline_pb2.IntermediateDeploymentConfig.DESCRIPTOR):
-    return None
+    return {}
   depl_config = pipeline_pb2.IntermediateDeploymentConfig()
   pipeline.deployment_config.Unpack(depl_config)
-  return depl_config.executor_specs.get(node_id)
+  return dict(depl_config.executor_specs)
 
 
 def _topsorted_layers(
-    pipeline: pipeline_pb2.Pipeline) -> List[List[pipeline_pb2.PipelineNode]]:
-  """Returns pipeline nodes in topologically sorted layers."""
-  node_by_id = {
-      node.pipeline_node.node_info.id: node.pipeline_node
-      for node in pipeline.nodes
-  }
-  return topsort.topsorted_layers(
-      [node.pipeline_node for node in pipeline.nodes],
-      get_node_id_fn=lambda node: node.node_info.id,
-      get_parent_nodes=(
-          lambda node: [node_by_id[n] for n in node.upstream_nodes]),
-      get_child_nodes=(
-          lambda node: [node_by_id[n] for n in node.downstream_nodes]))
-
-
-def _terminal_node_ids(
-    layers: List[List[pipeline_pb2.PipelineNode]]) -> Set[str]:
-  """Returns nodes across all layers that have no downstream nodes."""
-  terminal_node_ids: Set[str] = set()
-  for layer_nodes in layers:
-    for node in layer_nodes:
-      if not node.downstream_nodes:
-        terminal_node_ids.add(node.node_info.id)
-  return terminal_node_ids
+    node_by_id: Mapping[str, pipeline_pb2.PipelineNode],
+    upstream_by_node_id: Mapping[str, FrozenSet[str]]
+) -> List[List[pipeline_pb2.PipelineNode]]:
+  """Returns pipeline nodes in topologically sorted layers.
+
+  Uses Kahn's algorithm over integer node indices so that each edge is visited
+  exactly once. Nodes within a layer are sorted by node id.
+
+  Args:
+    node_by_id: A mapping from node id to pipeline node.
+    upstream_by_node_id: A mapping from node id to its upstream node ids.
+
+  Returns:
+    A list of topologically ordered node layers.
+
+  Raises:
+    topsort.InvalidDAGError: If the nodes don't form a DAG.
+  """
+  nodes = list(node_by_id.values())
+  node_ids = list(node_by_id)
+  id_to_idx = {node_id: i for i, node_id in enumerate(node_ids)}
+
+  # Edges are derived from upstream node ids only so that in-degrees and
+  # children are always consistent. Unknown references are ignored. In-degrees
+  # and children are stored as contiguous int arrays indexed by node position.
+  indeg = array.array('i', [0]) * len(nodes)
+  children: List[array.array] = [array.array('i') for _ in nodes]
+  for i, node_id in enumerate(node_ids):
+    for parent_id in upstream_by_node_id[node_id]:
+      if parent_id in id_to_idx:
+        children[id_to_idx[parent_id]].append(i)
+        indeg[i] += 1
+
+  layers = []
+  num_visited = 0
+  frontier = [i for i, degree in enumerate(indeg) if degree == 0]
+  while frontier:
+    frontier.sort(key=node_ids.__getitem__)
+    layers.append([nodes[i] for i in frontier])
+    num_visited += len(frontier)
+    next_frontier = []
+    for i in frontier:
+      for child_idx in children[i]:
+        indeg[child_idx] -= 1
+        if indeg[child_idx] == 0:
+          next_frontier.append(child_idx)
+    frontier = next_frontier
+
+  # Nodes in cycles never reach an in-degree of zero.
+  if num_visited < len(nodes):
+    raise topsort.InvalidDAGError('Cycle detected.')
+  return layers
@@ -34,11 +34,28 @@ from tfx.orchestration.experimental.core import test_utils
 from tfx.orchestration.experimental.core.testing import test_sync_pipeline
 from tfx.orchestration.portable import runtime_parameter_utils
 from tfx.orchestration.portable.mlmd import execution_lib
+from tfx.proto.orchestration import pipeline_pb2
 from tfx.utils import status as status_lib
+from tfx.utils import topsort
 
 from ml_metadata.proto import metadata_store_pb2
 
 
+def _make_node_maps(upstream_node_ids_by_node_id):
+  """Returns the node and upstream maps taken by `_topsorted_layers`."""
+  node_by_id = {}
+  for node_id, upstream_node_ids in upstream_node_ids_by_node_id.items():
+    node = pipeline_pb2.PipelineNode()
+    node.node_info.id = node_id
+    node.upstream_nodes.extend(upstream_node_ids)
+    node_by_id[node_id] = node
+  upstream_by_node_id = {
+      node_id: frozenset(upstream_node_ids)
+      for node_id, upstream_node_ids in upstream_node_ids_by_node_id.items()
+  }
+  return node_by_id, upstream_by_node_id
+
+
 class SyncPipelineTaskGeneratorTest(test_utils.TfxTest, parameterized.TestCase):
 
   def setUp(self):
@@ -133,6 +150,13 @@ class SyncPipelineTaskGeneratorTest(test_utils.TfxTest, parameterized.TestCase):
         self._mock_service_job_manager,
         ignore_update_node_state_tasks=ignore_update_node_state_tasks)
 
+  def _terminal_node_ids(self):
+    with self._mlmd_connection as m:
+      generator = sptg.SyncPipelineTaskGenerator(
+          m, test_utils.get_or_create_pipeline_state(m, self._pipeline),
+          self._task_queue.contains_task_id, self._mock_service_job_manager)
+    return generator._terminal_node_ids
+
   def _run_next(self,
                 use_task_queue,
                 expect_nodes,
@@ -323,7 +347,6 @@ class SyncPipelineTaskGeneratorTest(test_utils.TfxTest, parameterized.TestCase):
         when task queue is empty (for eg: due to orchestrator restart).
     """
     # Check the expected terminal nodes.
-    layers = sptg._topsorted_layers(self._pipeline)
     self.assertEqual(
         {
             self._example_validator.node_info.id,
@@ -332,7 +355,7 @@ class SyncPipelineTaskGeneratorTest(test_utils.TfxTest, parameterized.TestCase):
             # the condition always evaluates to False in the current test.
             self._evaluator.node_info.id,
         },
-        sptg._terminal_node_ids(layers))
+        self._terminal_node_ids())
 
     # Start executing the pipeline:
 
@@ -654,6 +677,75 @@ class SyncPipelineTaskGeneratorTest(test_utils.TfxTest, parameterized.TestCase):
         ignore_update_node_state_tasks=True)
     self.assertLen(tasks, num_tasks_generated)
 
+  def test_executions_not_fetched_for_tracked_nodes(self):
+    """Tests that executions are not read for nodes with a tracked task."""
+    test_utils.fake_example_gen_run(self._mlmd_connection, self._example_gen, 1,
+                                    1)
+    [stats_gen_task] = self._generate_and_test(
+        True,
+        num_initial_executions=1,
+        num_tasks_generated=1,
+        num_new_executions=1,
+        num_active_executions=1,
+        ignore_update_node_state_tasks=True)
+    self.assertEqual(self._stats_gen.node_info.id,
+                     stats_gen_task.node_uid.node_id)
+
+    # Stats-gen task is still in the task queue, so neither the batched nor
+    # the per-node execution lookup should be made for it.
+    with mock.patch.object(
+        task_gen_utils,
+        'get_executions_for_nodes',
+        wraps=task_gen_utils.get_executions_for_nodes
+    ) as mock_get_executions_for_nodes, mock.patch.object(
+        task_gen_utils, 'get_executions',
+        wraps=task_gen_utils.get_executions) as mock_get_executions:
+      self.assertEmpty(self._generate(True, True))
+    for call in mock_get_executions_for_nodes.call_args_list:
+      self.assertEmpty(call[0][1])
+    mock_get_executions.assert_not_called()
+
+  def test_node_states_read_only_for_pending_nodes(self):
+    """Tests that node states are only read for nodes that may have tasks."""
+    test_utils.fake_example_gen_run(self._mlmd_connection, self._example_gen, 1,
+                                    1)
+    self._generate_and_test(
+        True,
+        num_initial_executions=1,
+        num_tasks_generated=1,
+        num_new_executions=1,
+        num_active_executions=1,
+        ignore_update_node_state_tasks=True)
+
+    # Example-gen is cached as successful and the nodes downstream of
+    # stats-gen are still waiting on it, so only the state of stats-gen is
+    # read.
+    with mock.patch.object(
+        pstate.PipelineState,
+        'get_node_state',
+        autospec=True,
+        side_effect=pstate.PipelineState.get_node_state) as mock_get_node_state:
+      self.assertEmpty(self._generate(True, True))
+    self.assertEqual(
+        [self._stats_gen.node_info.id],
+        [call[0][1].node_id for call in mock_get_node_state.call_args_list])
+
+  def test_successful_nodes_cache_is_bounded(self):
+    """Tests that the oldest cached run is evicted when the cache is full."""
+    stale_key = (task_lib.PipelineUid(pipeline_id='stale'), 'stale_run')
+    with mock.patch.object(sptg, '_MAX_CACHED_RUNS', 1), mock.patch.object(
+        sptg, '_successful_nodes_by_run', {stale_key: {'stale_node'}}):
+      test_utils.fake_example_gen_run(self._mlmd_connection,
+                                      self._example_gen, 1, 1)
+      self._generate(False, True)
+      pipeline_uid = task_lib.PipelineUid.from_pipeline(self._pipeline)
+      run_id = (
+          self._pipeline.runtime_spec.pipeline_run_id.field_value.string_value)
+      self.assertEqual([(pipeline_uid, run_id)],
+                       list(sptg._successful_nodes_by_run))
+      self.assertIn(self._example_gen.node_info.id,
+                    sptg._successful_nodes_by_run[(pipeline_uid, run_id)])
+
   def test_restart_node_cancelled_due_to_stopping(self):
     """Tests that a node previously cancelled due to stopping can be restarted."""
     test_utils.fake_example_gen_run(self._mlmd_connection, self._example_gen, 1,
@@ -709,13 +801,12 @@ class SyncPipelineTaskGeneratorTest(test_utils.TfxTest, parameterized.TestCase):
       evaluate: Whether to run the conditional evaluator.
     """
     # Check the expected terminal nodes.
-    layers = sptg._topsorted_layers(self._pipeline)
     self.assertEqual(
         {
             self._example_validator.node_info.id,
             self._chore_b.node_info.id,
             self._evaluator.node_info.id,
-        }, sptg._terminal_node_ids(layers))
+        }, self._terminal_node_ids())
 
     # Start executing the pipeline:
 
@@ -762,6 +853,51 @@ class SyncPipelineTaskGeneratorTest(test_utils.TfxTest, parameterized.TestCase):
     [finalize_task] = self._generate(False, True)
     self.assertTrue(task_lib.is_finalize_pipeline_task(finalize_task))
 
+  def test_topsorted_layers(self):
+    node_by_id, upstream_by_node_id = _make_node_maps({
+        'e': ['c', 'd'],
+        'b': [],
+        'd': ['a'],
+        'a': [],
+        'c': ['a', 'b'],
+    })
+    layers = sptg._topsorted_layers(node_by_id, upstream_by_node_id)
+    self.assertEqual(
+        [['a', 'b'], ['c', 'd'], ['e']],
+        [[node.node_info.id for node in layer] for layer in layers])
+    # The layers contain the same node protos that were passed in.
+    self.assertIs(node_by_id['a'], layers[0][0])
+
+  def test_topsorted_layers_ignores_unknown_upstream_nodes(self):
+    node_by_id, upstream_by_node_id = _make_node_maps({
+        'a': ['unknown'],
+        'b': ['a', 'unknown'],
+    })
+    layers = sptg._topsorted_layers(node_by_id, upstream_by_node_id)
+    self.assertEqual(
+        [['a'], ['b']],
+        [[node.node_info.id for node in layer] for layer in layers])
+
+  def test_topsorted_layers_cycle(self):
+    node_by_id, upstream_by_node_id = _make_node_maps({
+        'a': [],
+        'b': ['a', 'c'],
+        'c': ['b'],
+    })
+    with self.assertRaisesRegex(topsort.InvalidDAGError, 'Cycle detected'):
+      sptg._topsorted_layers(node_by_id, upstream_by_node_id)
+
+  def test_duplicate_node_ids(self):
+    pipeline = pipeline_pb2.Pipeline()
+    pipeline.CopyFrom(self._pipeline)
+    pipeline.nodes.add().CopyFrom(pipeline.nodes[0])
+    with self._mlmd_connection as m:
+      pipeline_state = test_utils.get_or_create_pipeline_state(m, pipeline)
+      with self.assertRaisesRegex(ValueError, 'must have unique ids'):
+        sptg.SyncPipelineTaskGenerator(m, pipeline_state,
+                                       self._task_queue.contains_task_id,
+                                       self._mock_service_job_manager)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -217,6 +217,55 @@ def get_executions(
       metadata_handler, contexts)
 
 
+def get_executions_for_nodes(
+    metadata_handler: metadata.Metadata,
+    nodes: Sequence[pipeline_pb2.PipelineNode]
+) -> Dict[str, List[metadata_store_pb2.Execution]]:
+  """Returns all executions for each of the given pipeline nodes.
+
+  This is a batched version of `get_executions`. Contexts shared across the
+  nodes (eg: pipeline and pipeline run contexts) and the executions associated
+  with them are fetched from MLMD only once.
+
+  Args:
+    metadata_handler: A handler to access MLMD db.
+    nodes: The pipeline nodes for which to obtain executions.
+
+  Returns:
+    A dict mapping node ids to the list of executions for the node in MLMD db.
+  """
+  contexts_by_type_and_name = {}
+  executions_by_context_id = {}
+  result = {}
+  for node in nodes:
+    executions_dict = None
+    for context_spec in node.contexts.contexts:
+      key = (context_spec.type.name,
+             data_types_utils.get_value(context_spec.name))
+      if key not in contexts_by_type_and_name:
+        contexts_by_type_and_name[key] = (
+            metadata_handler.store.get_context_by_type_and_name(*key))
+      context = contexts_by_type_and_name[key]
+      if context is None:
+        # If no context is registered, it's certain that there is no
+        # associated execution for the node.
+        executions_dict = None
+        break
+      if context.id not in executions_by_context_id:
+        executions_by_context_id[context.id] = (
+            metadata_handler.store.get_executions_by_context(context.id))
+      executions = executions_by_context_id[context.id]
+      if executions_dict is None:
+        executions_dict = {e.id: e for e in executions}
+      else:
+        executions_dict = {
+            e.id: e for e in executions if e.id in executions_dict
+        }
+    result[node.node_info.id] = (
+        list(executions_dict.values()) if executions_dict else [])
+  return result
+
+
 def is_latest_execution_successful(
     executions: Sequence[metadata_store_pb2.Execution]) -> bool:
   """Returns `True` if the latest execution was successful.
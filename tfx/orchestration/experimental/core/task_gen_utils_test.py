@@ -105,6 +105,35 @@ class TaskGenUtilsTest(tu.TfxTest):
                             task_gen_utils.get_executions(m, self._transform))
       self.assertEmpty(task_gen_utils.get_executions(m, self._trainer))
 
+  def test_get_executions_for_nodes(self):
+    nodes = [n.pipeline_node for n in self._pipeline.nodes]
+    with self._mlmd_connection as m:
+      self.assertEqual({node.node_info.id: [] for node in nodes},
+                       task_gen_utils.get_executions_for_nodes(m, nodes))
+
+    # Create executions for the same nodes under different pipeline contexts.
+    self._set_pipeline_context('my_pipeline1')
+    otu.fake_example_gen_run(self._mlmd_connection, self._example_gen, 1, 1)
+    otu.fake_example_gen_run(self._mlmd_connection, self._example_gen, 2, 1)
+    otu.fake_component_output(self._mlmd_connection, self._transform)
+    self._set_pipeline_context('my_pipeline2')
+    otu.fake_example_gen_run(self._mlmd_connection, self._example_gen, 1, 1)
+    otu.fake_component_output(self._mlmd_connection, self._transform)
+
+    # Check that the batched lookup agrees with per-node lookups.
+    for pipeline_context in ('my_pipeline1', 'my_pipeline2'):
+      self._set_pipeline_context(pipeline_context)
+      with self._mlmd_connection as m:
+        executions_by_node_id = task_gen_utils.get_executions_for_nodes(
+            m, nodes)
+        self.assertCountEqual([node.node_info.id for node in nodes],
+                              executions_by_node_id.keys())
+        for node in nodes:
+          self.assertCountEqual(
+              task_gen_utils.get_executions(m, node),
+              executions_by_node_id[node.node_info.id])
+      self.assertEmpty(executions_by_node_id[self._trainer.node_info.id])
+
   def test_is_latest_execution_successful(self):
     executions = []
     self.assertFalse(task_gen_utils.is_latest_execution_successful(executions))
@@ -55,6 +55,7 @@ def publish_cached_execution(
     contexts: Sequence[metadata_store_pb2.Context],
     execution_id: int,
     output_artifacts: Optional[typing_utils.ArtifactMultiMap] = None,
+    execution: Optional[metadata_store_pb2.Execution] = None,
 ) -> None:
   """Marks an existing execution as using cached outputs from a previous execution.
 
@@ -64,8 +65,14 @@ def publish_cached_execution(
     execution_id: The id of the execution.
     output_artifacts: Output artifacts of the execution. Each artifact will be
       linked with the execution through an event with type OUTPUT.
+    execution: The execution with id `execution_id`, if the caller has already
+      read it from MLMD. If not provided, it is read from MLMD by id.
   """
-  [execution] = metadata_handler.store.get_executions_by_id([execution_id])
+  if execution is None:
+    [execution] = metadata_handler.store.get_executions_by_id([execution_id])
+  elif execution.id != execution_id:
+    raise ValueError(
+        f'Execution id {execution.id} does not match {execution_id}.')
   execution.last_known_state = metadata_store_pb2.Execution.CACHED
 
   execution_lib.put_execution(
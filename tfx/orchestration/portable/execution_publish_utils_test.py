@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Tests for tfx.orchestration.portable.execution_publish_utils."""
+from unittest import mock
+
 from absl.testing import parameterized
 import tensorflow as tf
 from tfx.orchestration import metadata
@@ -151,6 +153,33 @@ class ExecutionPublisherTest(test_case_utils.TfxTest, parameterized.TestCase):
           [c.id for c in contexts],
           [c.id for c in m.store.get_contexts_by_artifact(output_example.id)])
 
+  def testPublishCachedExecution_withLoadedExecution(self):
+    with metadata.Metadata(connection_config=self._connection_config) as m:
+      contexts = self._generate_contexts(m)
+      execution = execution_publish_utils.register_execution(
+          m, self._execution_type, contexts)
+      output_example = standard_artifacts.Examples()
+      with mock.patch.object(
+          m.store, 'get_executions_by_id',
+          wraps=m.store.get_executions_by_id) as mock_get_executions_by_id:
+        execution_publish_utils.publish_cached_execution(
+            m,
+            contexts,
+            execution.id,
+            output_artifacts={'examples': [output_example]},
+            execution=execution)
+        mock_get_executions_by_id.assert_not_called()
+      [execution] = m.store.get_executions()
+      self.assertEqual(metadata_store_pb2.Execution.CACHED,
+                       execution.last_known_state)
+      [event] = m.store.get_events_by_execution_ids([execution.id])
+      self.assertEqual(metadata_store_pb2.Event.OUTPUT, event.type)
+      self.assertEqual(output_example.id, event.artifact_id)
+
+      with self.assertRaisesRegex(ValueError, 'does not match'):
+        execution_publish_utils.publish_cached_execution(
+            m, contexts, execution.id + 1, execution=execution)
+
   def testPublishSuccessfulExecution(self):
     with metadata.Metadata(connection_config=self._connection_config) as m:
       contexts = self._generate_contexts(m)
@@ -302,35 +302,83 @@ def get_artifacts_dict(
       artifacts cannot be determined or if all the artifacts could not be
       fetched from MLMD.
   """
-  events = metadata_handler.store.get_events_by_execution_ids([execution_id])
+  return get_artifacts_dicts(metadata_handler, [execution_id],
+                             event_type)[execution_id]
+
+
+def get_artifacts_dicts(
+    metadata_handler: metadata.Metadata, execution_ids: Sequence[int],
+    event_type: 'metadata_store_pb2.Event.Type'
+) -> Dict[int, typing_utils.ArtifactMultiDict]:
+  """Returns a map from execution id to the artifacts dict of that execution.
+
+  This is the batched version of `get_artifacts_dict`. It issues a constant
+  number of MLMD reads regardless of the number of executions.
 
-  # Create a map from "key" to list of (index, artifact_id)s.
-  indexed_artifact_ids_dict = collections.defaultdict(list)
+  Args:
+    metadata_handler: A handler to access MLMD.
+    execution_ids: Ids of the executions for which to get artifacts.
+    event_type: Event type to filter by.
+
+  Returns:
+    A dict mapping each of the execution ids to a dict mapping key to an ordered
+    list of artifacts, as returned by `get_artifacts_dict`.
+
+  Raises:
+    ValueError: If the events are badly formed and correct ordering of
+      artifacts cannot be determined or if all the artifacts could not be
+      fetched from MLMD.
+  """
+  result = {
+      execution_id: collections.defaultdict(list)
+      for execution_id in execution_ids
+  }
+  if not execution_ids:
+    return result
+  events = metadata_handler.store.get_events_by_execution_ids(
+      list(result.keys()))
+
+  # Create a map from execution id to a map from "key" to list of
+  # (index, artifact_id)s.
+  indexed_artifact_ids_dicts = collections.defaultdict(
+      lambda: collections.defaultdict(list))
   for event in events:
     if event.type != event_type:
       continue
     key, index = event_lib.get_artifact_path(event)
-    artifact_id = event.artifact_id
-    indexed_artifact_ids_dict[key].append((index, artifact_id))
-
-  # Create a map from "key" to ordered list of artifact ids.
-  artifact_ids_dict = {}
-  for key, indexed_artifact_ids in indexed_artifact_ids_dict.items():
-    ordered_artifact_ids = sorted(indexed_artifact_ids, key=lambda x: x[0])
-    # There shouldn't be any missing or duplicate indices.
-    indices = [idx for idx, _ in ordered_artifact_ids]
-    if indices != list(range(0, len(indices))):
-      raise ValueError(
-          f'Cannot construct artifact ids dict due to missing or duplicate '
-          f'indices: {indexed_artifact_ids_dict}')
-    artifact_ids_dict[key] = [aid for _, aid in ordered_artifact_ids]
+    indexed_artifact_ids_dicts[event.execution_id][key].append(
+        (index, event.artifact_id))
+
+  # Create a map from execution id to a map from "key" to ordered list of
+  # artifact ids.
+  artifact_ids_dicts = {}
+  for execution_id, indexed_artifact_ids_dict in (
+      indexed_artifact_ids_dicts.items()):
+    artifact_ids_dict = {}
+    for key, indexed_artifact_ids in indexed_artifact_ids_dict.items():
+      ordered_artifact_ids = sorted(indexed_artifact_ids, key=lambda x: x[0])
+      # There shouldn't be any missing or duplicate indices.
+      indices = [idx for idx, _ in ordered_artifact_ids]
+      if indices != list(range(0, len(indices))):
+        raise ValueError(
+            f'Cannot construct artifact ids dict due to missing or duplicate '
+            f'indices: {indexed_artifact_ids_dict}')
+      artifact_ids_dict[key] = [aid for _, aid in ordered_artifact_ids]
+    artifact_ids_dicts[execution_id] = artifact_ids_dict
 
   # Fetch all the relevant artifacts.
-  all_artifact_ids = list(itertools.chain(*artifact_ids_dict.values()))
-  mlmd_artifacts = metadata_handler.store.get_artifacts_by_id(all_artifact_ids)
+  all_artifact_ids = set(
+      itertools.chain.from_iterable(
+          itertools.chain.from_iterable(artifact_ids_dict.values())
+          for artifact_ids_dict in artifact_ids_dicts.values()))
+  if not all_artifact_ids:
+    return result
+  mlmd_artifacts = metadata_handler.store.get_artifacts_by_id(
+      list(all_artifact_ids))
   if len(all_artifact_ids) != len(mlmd_artifacts):
     raise ValueError('Could not find all mlmd artifacts for ids: {}'.format(
-        ', '.join(all_artifact_ids)))
+        ', '.join(str(aid) for aid in all_artifact_ids)))
+  mlmd_artifacts_by_id = {a.id: a for a in mlmd_artifacts}
 
   # Fetch artifact types and create a map keyed by artifact type id.
   artifact_type_ids = set(a.type_id for a in mlmd_artifacts)
@@ -338,20 +386,16 @@ def get_artifacts_dict(
       artifact_type_ids)
   artifact_types_by_id = {a.id: a for a in artifact_types}
 
-  # Create a map from artifact id to `types.Artifact` instances.
-  artifacts_by_id = {
-      aid: artifact_utils.deserialize_artifact(artifact_types_by_id[a.type_id],
-                                               a)
-      for aid, a in zip(all_artifact_ids, mlmd_artifacts)
-  }
-
-  # Create a map from "key" to ordered list of `types.Artifact` to be returned.
-  # The ordering of artifacts is in accordance with their "index" derived from
-  # the events above.
-  result = collections.defaultdict(list)
-  for key, artifact_ids in artifact_ids_dict.items():
-    for artifact_id in artifact_ids:
-      result[key].append(artifacts_by_id[artifact_id])
+  # Create `types.Artifact` instances, ordered in accordance with their
+  # "index" derived from the events above. Each execution gets its own
+  # instances, as callers may modify them.
+  for execution_id, artifact_ids_dict in artifact_ids_dicts.items():
+    for key, artifact_ids in artifact_ids_dict.items():
+      for artifact_id in artifact_ids:
+        mlmd_artifact = mlmd_artifacts_by_id[artifact_id]
+        result[execution_id][key].append(
+            artifact_utils.deserialize_artifact(
+                artifact_types_by_id[mlmd_artifact.type_id], mlmd_artifact))
 
   return result
 
@@ -327,6 +327,47 @@ class ExecutionLibTest(test_case_utils.TfxTest):
       self.assertEqual([model.uri for model in output_models],
                        [a.uri for a in artifacts_dict['model']])
 
+  def testGetArtifactsDicts(self):
+    with metadata.Metadata(connection_config=self._connection_config) as m:
+      contexts = self._generate_contexts(m)
+      executions = []
+      for i in range(3):
+        output_models = []
+        for j in range(i + 1):
+          output_model = standard_artifacts.Model()
+          output_model.uri = 'model{}_{}'.format(i, j)
+          output_model.type_id = common_utils.register_type_if_not_exist(
+              m, output_model.artifact_type).id
+          output_models.append(output_model)
+        random.shuffle(output_models)
+        m.store.put_artifacts([a.mlmd_artifact for a in output_models])
+        execution = execution_lib.prepare_execution(
+            m,
+            metadata_store_pb2.ExecutionType(name='my_execution_type'),
+            state=metadata_store_pb2.Execution.RUNNING)
+        execution = execution_lib.put_execution(
+            m, execution, contexts, output_artifacts={'model': output_models})
+        executions.append(execution)
+
+      # Verify that the batched result matches the per-execution result.
+      execution_ids = [e.id for e in executions]
+      artifacts_dicts = execution_lib.get_artifacts_dicts(
+          m, execution_ids, metadata_store_pb2.Event.OUTPUT)
+      self.assertCountEqual(execution_ids, list(artifacts_dicts.keys()))
+      for execution_id in execution_ids:
+        artifacts_dict = execution_lib.get_artifacts_dict(
+            m, execution_id, metadata_store_pb2.Event.OUTPUT)
+        self.assertCountEqual(
+            list(artifacts_dict.keys()),
+            list(artifacts_dicts[execution_id].keys()))
+        self.assertEqual(
+            [a.uri for a in artifacts_dict['model']],
+            [a.uri for a in artifacts_dicts[execution_id]['model']])
+      self.assertEqual({},
+                       execution_lib.get_artifacts_dicts(
+                           m, execution_ids, metadata_store_pb2.Event.INPUT)[
+                               execution_ids[0]])
+
   def test_set_and_get_execution_result(self):
     execution = metadata_store_pb2.Execution()
     execution_result = text_format.Parse(
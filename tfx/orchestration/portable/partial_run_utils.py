@@ -14,8 +14,10 @@
 """Portable library for partial runs."""
 
 import collections
-import enum
-from typing import Any, Callable, Collection, List, Mapping, MutableMapping, Optional, Set, Tuple, Union
+from concurrent import futures
+import functools
+import threading
+from typing import Any, Callable, Collection, Dict, FrozenSet, List, Mapping, MutableMapping, Optional, Sequence, Set, Tuple, Union
 
 from absl import logging
 from tfx.dsl.compiler import compiler_utils
@@ -71,21 +73,26 @@ def filter_pipeline(
   _ensure_topologically_sorted(input_pipeline)
 
   node_map = _make_ordered_node_map(input_pipeline)
+  upstream_adj, downstream_adj = _build_adjacency(node_map)
   from_node_ids = [node_id for node_id in node_map if from_nodes(node_id)]
   to_node_ids = [node_id for node_id in node_map if to_nodes(node_id)]
-  node_map = _filter_node_map(node_map, from_node_ids, to_node_ids)
-  node_map, excluded_direct_dependencies = _fix_nodes(node_map)
+  node_map = _filter_node_map(node_map, upstream_adj, downstream_adj,
+                              from_node_ids, to_node_ids)
   fixed_deployment_config = _fix_deployment_config(input_pipeline, node_map)
   filtered_pipeline = _make_filtered_pipeline(input_pipeline, node_map,
                                               fixed_deployment_config)
+  if len(node_map) == len(input_pipeline.nodes):
+    # Nothing was filtered out, and _ensure_topologically_sorted has already
+    # rejected references to unknown nodes, so there is nothing to fix.
+    excluded_direct_dependencies = {}
+  else:
+    # node_map still references the input pipeline, so fix up the nodes of the
+    # filtered copy instead.
+    excluded_direct_dependencies = _fix_nodes(
+        _make_ordered_node_map(filtered_pipeline))
   return filtered_pipeline, excluded_direct_dependencies
 
 
-class _Direction(enum.Enum):
-  UPSTREAM = 1
-  DOWNSTREAM = 2
-
-
 def _ensure_sync_pipeline(pipeline: pipeline_pb2.Pipeline):
   """Raises ValueError if the pipeline's execution_mode is not SYNC."""
   if pipeline.execution_mode != pipeline_pb2.Pipeline.SYNC:
@@ -125,33 +132,28 @@ def _ensure_topologically_sorted(pipeline: pipeline_pb2.Pipeline):
   Raises:
     ValueError: If the pipeline is not topologically sorted.
   """
-  # Upstream check
-  visited = set()
-  for pipeline_or_node in pipeline.nodes:
-    node = pipeline_or_node.pipeline_node
+  nodes = [
+      pipeline_or_node.pipeline_node for pipeline_or_node in pipeline.nodes
+  ]
+  position = {node.node_info.id: i for i, node in enumerate(nodes)}
+  for i, node in enumerate(nodes):
     for upstream_node in node.upstream_nodes:
-      if upstream_node not in visited:
+      if position.get(upstream_node, i) >= i:
         raise ValueError(
             'Input pipeline is not topologically sorted. '
             f'node {node.node_info.id} has upstream_node {upstream_node}, but '
             f'{upstream_node} does not appear before {node.node_info.id}')
-    visited.add(node.node_info.id)
-  # Downstream check
-  visited.clear()
-  for pipeline_or_node in reversed(pipeline.nodes):
-    node = pipeline_or_node.pipeline_node
     for downstream_node in node.downstream_nodes:
-      if downstream_node not in visited:
+      if position.get(downstream_node, i) <= i:
         raise ValueError(
             'Input pipeline is not topologically sorted. '
             f'node {node.node_info.id} has downstream_node {downstream_node}, '
             f'but {downstream_node} does not appear after {node.node_info.id}')
-    visited.add(node.node_info.id)
 
 
 def _make_ordered_node_map(
     pipeline: pipeline_pb2.Pipeline
-) -> 'collections.OrderedDict[str, pipeline_pb2.PipelineNode]':
+) -> Dict[str, pipeline_pb2.PipelineNode]:
   """Prepares the Pipeline proto for DAG traversal.
 
   Args:
@@ -159,22 +161,42 @@ def _make_ordered_node_map(
       sorted.
 
   Returns:
-    An OrderedDict that maps node_ids to PipelineNodes.
+    A dict that maps node_ids to PipelineNodes, in pipeline order.
   """
-  result = collections.OrderedDict()
+  result = {}
   for pipeline_or_node in pipeline.nodes:
-    node_id = pipeline_or_node.pipeline_node.node_info.id
-    result[node_id] = pipeline_or_node.pipeline_node
+    node = pipeline_or_node.pipeline_node
+    result[node.node_info.id] = node
   return result
 
 
-def _traverse(node_map: Mapping[str, pipeline_pb2.PipelineNode],
-              direction: _Direction, start_nodes: Collection[str]) -> Set[str]:
-  """Traverses a DAG from start_nodes, either upstream or downstream.
+def _build_adjacency(
+    node_map: Mapping[str, pipeline_pb2.PipelineNode]
+) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+  """Reads the upstream and downstream node ids of every node once.
 
   Args:
     node_map: Mapping of node_id to nodes.
-    direction: _Direction.UPSTREAM or _Direction.DOWNSTREAM.
+
+  Returns:
+    A Tuple of two dicts, mapping node_ids to their upstream node_ids and
+    downstream node_ids respectively.
+  """
+  upstream_adj = {}
+  downstream_adj = {}
+  for node_id, node in node_map.items():
+    upstream_adj[node_id] = list(node.upstream_nodes)
+    downstream_adj[node_id] = list(node.downstream_nodes)
+  return upstream_adj, downstream_adj
+
+
+def _traverse(adj: Mapping[str, Sequence[str]],
+              start_nodes: Collection[str]) -> Set[str]:
+  """Traverses a DAG from start_nodes along the edges given by adj.
+
+  Args:
+    adj: Mapping of node_id to its neighboring node_ids, either upstream or
+      downstream.
     start_nodes: node_ids to start from.
 
   Returns:
@@ -190,24 +212,50 @@ def _traverse(node_map: Mapping[str, pipeline_pb2.PipelineNode],
       if current_node_id in result:
         continue
       result.add(current_node_id)
-      if direction == _Direction.UPSTREAM:
-        stack.extend(node_map[current_node_id].upstream_nodes)
-      elif direction == _Direction.DOWNSTREAM:
-        stack.extend(node_map[current_node_id].downstream_nodes)
+      # Skip neighbors that were already visited, so that shared ancestors or
+      # descendants are not pushed once per incoming edge.
+      stack.extend(node_id for node_id in adj[current_node_id]
+                   if node_id not in result)
   return result
 
 
 def _filter_node_map(
-    node_map: 'collections.OrderedDict[str, pipeline_pb2.PipelineNode]',
+    node_map: Dict[str, pipeline_pb2.PipelineNode],
+    upstream_adj: Mapping[str, Sequence[str]],
+    downstream_adj: Mapping[str, Sequence[str]],
     from_node_ids: Collection[str],
     to_node_ids: Collection[str],
-) -> 'collections.OrderedDict[str, pipeline_pb2.PipelineNode]':
-  """Returns an OrderedDict with only the nodes we want to include."""
-  ancestors_of_to_nodes = _traverse(node_map, _Direction.UPSTREAM, to_node_ids)
-  descendents_of_from_nodes = _traverse(node_map, _Direction.DOWNSTREAM,
-                                        from_node_ids)
-  nodes_to_keep = ancestors_of_to_nodes.intersection(descendents_of_from_nodes)
-  result = collections.OrderedDict()
+) -> Dict[str, pipeline_pb2.PipelineNode]:
+  """Returns a dict with only the nodes we want to include.
+
+  The nodes to keep are the descendents of from_nodes that are also ancestors
+  of to_nodes. Every node on a path from a from_node to such a node is itself
+  an ancestor of to_nodes, so the downstream traversal only needs to visit the
+  ancestors of to_nodes, and no separate intersection is needed.
+
+  Args:
+    node_map: Mapping of node_id to nodes.
+    upstream_adj: Mapping of node_id to its upstream node_ids.
+    downstream_adj: Mapping of node_id to its downstream node_ids.
+    from_node_ids: node_ids where the downstream traversal starts from.
+    to_node_ids: node_ids where the upstream traversal starts from.
+
+  Returns:
+    A dict with only the nodes to keep, in the original order.
+  """
+  ancestors_of_to_nodes = _traverse(upstream_adj, to_node_ids)
+  nodes_to_keep = set()
+  stack = [
+      node_id for node_id in from_node_ids if node_id in ancestors_of_to_nodes
+  ]
+  while stack:
+    current_node_id = stack.pop()
+    if current_node_id in nodes_to_keep:
+      continue
+    nodes_to_keep.add(current_node_id)
+    stack.extend(node_id for node_id in downstream_adj[current_node_id]
+                 if node_id in ancestors_of_to_nodes)
+  result = {}
   for node_id, node in node_map.items():
     if node_id in nodes_to_keep:
       result[node_id] = node
@@ -216,76 +264,82 @@ def _filter_node_map(
 
 def _remove_dangling_downstream_nodes(
     node: pipeline_pb2.PipelineNode,
-    node_ids_to_keep: Collection[str]) -> pipeline_pb2.PipelineNode:
-  """Removes node.downstream_nodes that have been filtered out."""
+    node_ids_to_keep: FrozenSet[str]) -> None:
+  """Removes node.downstream_nodes that have been filtered out, in place."""
   # Using a loop instead of set intersection to ensure the same order.
   downstream_nodes_to_keep = [
       downstream_node for downstream_node in node.downstream_nodes
       if downstream_node in node_ids_to_keep
   ]
-  if len(downstream_nodes_to_keep) == len(node.downstream_nodes):
-    return node
-  result = pipeline_pb2.PipelineNode()
-  result.CopyFrom(node)
-  result.downstream_nodes[:] = downstream_nodes_to_keep
-  return result
+  if len(downstream_nodes_to_keep) != len(node.downstream_nodes):
+    node.downstream_nodes[:] = downstream_nodes_to_keep
 
 
 def _handle_missing_inputs(
     node: pipeline_pb2.PipelineNode,
-    node_ids_to_keep: Collection[str],
-) -> Tuple[pipeline_pb2.PipelineNode, Mapping[
-    str, List[pipeline_pb2.InputSpec.Channel]]]:
-  """Handles missing inputs.
+    node_ids_to_keep: FrozenSet[str],
+) -> Mapping[str, List[pipeline_pb2.InputSpec.Channel]]:
+  """Handles missing inputs, mutating the node in place.
 
   Args:
-    node: The Pipeline node to check for missing inputs.
+    node: The Pipeline node to check for missing inputs. Its upstream_nodes
+      that have been filtered out are removed.
     node_ids_to_keep: The node_ids that are not filtered out.
 
   Returns:
-    A Tuple containing two elements:
-    - A copy of the Pipeline node with some nodes removed,
-    - A Mapping from removed node_ids to a list of input channels that use it as
-      the producer node.
+    A Mapping from removed node_ids to a list of input channels that use it as
+    the producer node.
   """
-  upstream_nodes_removed = set()
-  upstream_nodes_to_keep = []
-  for upstream_node in node.upstream_nodes:
-    if upstream_node in node_ids_to_keep:
-      upstream_nodes_to_keep.append(upstream_node)
-    else:
-      upstream_nodes_removed.add(upstream_node)
-
+  upstream_nodes = list(node.upstream_nodes)
+  upstream_nodes_removed = frozenset(
+      upstream_node for upstream_node in upstream_nodes
+      if upstream_node not in node_ids_to_keep)
   if not upstream_nodes_removed:
-    return node, {}  # No parent missing, no need to change anything.
+    return {}  # No parent missing, no need to change anything.
 
   excluded_direct_deps = collections.defaultdict(list)
-  new_node = pipeline_pb2.PipelineNode()
-  new_node.CopyFrom(node)
-  for input_spec in new_node.inputs.inputs.values():
+  for input_spec in node.inputs.inputs.values():
     for channel in input_spec.channels:
       if channel.producer_node_query.id in upstream_nodes_removed:
         excluded_direct_deps[channel.producer_node_query.id].append(channel)
-  new_node.upstream_nodes[:] = upstream_nodes_to_keep
-  return new_node, excluded_direct_deps
+  node.upstream_nodes[:] = [
+      upstream_node for upstream_node in upstream_nodes
+      if upstream_node not in upstream_nodes_removed
+  ]
+  return excluded_direct_deps
 
 
 def _fix_nodes(
-    node_map: 'collections.OrderedDict[str, pipeline_pb2.PipelineNode]',
-) -> Tuple['collections.OrderedDict[str, pipeline_pb2.PipelineNode]', Mapping[
-    str, List[pipeline_pb2.InputSpec.Channel]]]:
-  """Removes dangling references and handle missing inputs."""
-  fixed_nodes = collections.OrderedDict()
+    node_map: Dict[str, pipeline_pb2.PipelineNode],
+) -> Mapping[str, List[pipeline_pb2.InputSpec.Channel]]:
+  """Removes dangling references and handle missing inputs, in place.
+
+  The nodes in node_map must be owned by the filtered pipeline (see
+  _make_filtered_pipeline), since they are mutated directly.
+
+  Args:
+    node_map: Mapping from node_id to the nodes of the filtered pipeline.
+
+  Returns:
+    A Mapping from removed node_ids to a list of input channels that use it as
+    the producer node.
+  """
+  keep = frozenset(node_map)
+  # When only upstream nodes are filtered out, no downstream_nodes dangle and
+  # the per-node downstream scan can be skipped altogether.
+  needs_downstream_fix = any(
+      downstream_node not in keep
+      for node in node_map.values()
+      for downstream_node in node.downstream_nodes)
   merged_excluded_direct_deps = collections.defaultdict(list)
-  for node_id in node_map:
-    new_node = _remove_dangling_downstream_nodes(
-        node=node_map[node_id], node_ids_to_keep=node_map.keys())
-    new_node, excluded_direct_deps = _handle_missing_inputs(
-        node=new_node, node_ids_to_keep=node_map.keys())
-    fixed_nodes[node_id] = new_node
+  for node in node_map.values():
+    if needs_downstream_fix:
+      _remove_dangling_downstream_nodes(node=node, node_ids_to_keep=keep)
+    excluded_direct_deps = _handle_missing_inputs(
+        node=node, node_ids_to_keep=keep)
     for inner_node_id, channel_list in excluded_direct_deps.items():
       merged_excluded_direct_deps[inner_node_id] += channel_list
-  return fixed_nodes, merged_excluded_direct_deps
+  return merged_excluded_direct_deps
 
 
 def _fix_deployment_config(
@@ -305,14 +359,24 @@ def _fix_deployment_config(
   Returns:
     If the deployment_config field is set in the input_pipeline, this would
     output the deployment config with filtered per-node configs, then cast into
-    an Any proto. If the deployment_config field is unset in the input_pipeline,
-    then this function would return None.
+    an Any proto. If no per-node config needs to be filtered out, the
+    input_pipeline's deployment_config itself is returned. If the
+    deployment_config field is unset in the input_pipeline, then this function
+    would return None.
   """
   if not input_pipeline.HasField('deployment_config'):
     return None
 
   deployment_config = pipeline_pb2.IntermediateDeploymentConfig()
   input_pipeline.deployment_config.Unpack(deployment_config)
+  if all(
+      node_id in node_ids_to_keep
+      for config_map in (deployment_config.executor_specs,
+                         deployment_config.custom_driver_specs,
+                         deployment_config.node_level_platform_configs)
+      for node_id in config_map):
+    # Nothing to filter out, so skip re-packing the deployment config.
+    return input_pipeline.deployment_config
 
   def _fix_per_node_config(config_map: MutableMapping[str, Any]):
     for node_id in list(config_map.keys()):  # make a temporary copy of the keys
@@ -330,17 +394,18 @@ def _fix_deployment_config(
 
 def _make_filtered_pipeline(
     input_pipeline: pipeline_pb2.Pipeline,
-    node_map: 'collections.OrderedDict[str, pipeline_pb2.PipelineNode]',
+    node_ids_to_keep: Collection[str],
     fixed_deployment_config: Optional[any_pb2.Any] = None
 ) -> pipeline_pb2.Pipeline:
-  """Pieces different parts of the Pipeline proto together."""
+  """Copies the input pipeline once and drops filtered-out nodes in place."""
   result = pipeline_pb2.Pipeline()
   result.CopyFrom(input_pipeline)
-  del result.nodes[:]
-  result.nodes.extend(
-      pipeline_pb2.Pipeline.PipelineOrNode(pipeline_node=node_map[node_id])
-      for node_id in node_map)
-  if fixed_deployment_config:
+  # Delete from the back so that the remaining indices stay valid.
+  for i in reversed(range(len(result.nodes))):
+    if result.nodes[i].pipeline_node.node_info.id not in node_ids_to_keep:
+      del result.nodes[i]
+  if (fixed_deployment_config and
+      fixed_deployment_config is not input_pipeline.deployment_config):
     result.deployment_config.CopyFrom(fixed_deployment_config)
   return result
 
@@ -441,17 +506,17 @@ def _compute_nodes_to_reuse(full_pipeline, filtered_pipeline,
       outputs of `filter_pipeline` as the inputs to this function.
   """
   node_map = _make_ordered_node_map(full_pipeline)
+  _, downstream_adj = _build_adjacency(node_map)
   exclusion_set = _traverse(
-      node_map,
-      _Direction.DOWNSTREAM,
+      downstream_adj,
       start_nodes=[
           node.pipeline_node.node_info.id for node in filtered_pipeline.nodes
       ])
-  inclusion_set = _traverse(
-      node_map,
-      _Direction.UPSTREAM,
-      start_nodes=excluded_direct_dependencies.keys())
-  if not exclusion_set.isdisjoint(inclusion_set):
+  # The ancestors of excluded_direct_dependencies must not overlap with
+  # exclusion_set. As exclusion_set is closed under downstream edges, any such
+  # ancestor in exclusion_set would drag its descendant (one of the
+  # excluded_direct_dependencies) in with it, so it suffices to check those.
+  if not exclusion_set.isdisjoint(excluded_direct_dependencies.keys()):
     raise ValueError('This should never happen. '
                      'Did you modify the outputs of filter_pipeline?')
   # This is the maximal set of node executions that can be reused.
@@ -465,7 +530,8 @@ def reuse_pipeline_run_artifacts(
     excluded_direct_dependencies: Mapping[str,
                                           List[pipeline_pb2.InputSpec.Channel]],
     base_run_id: Optional[str] = None,
-    new_run_id: Optional[str] = None):
+    new_run_id: Optional[str] = None,
+    max_workers: int = 1):
   """Reuses the output Artifacts from a previous pipeline run.
 
   This computes the maximal set of nodes whose outputs can be associated with
@@ -494,6 +560,11 @@ def reuse_pipeline_run_artifacts(
       `new_run_id`. If found, and `new_run_id` is provided, it would verify that
       it is the same as the inferred run id, and raise an error if they are not
       the same.
+    max_workers: The maximum number of threads used to reuse the outputs of
+      different nodes concurrently. Defaults to 1, which reuses them
+      sequentially. Only set this above 1 if the MLMD connection behind
+      `metadata_handler` can be shared across threads, e.g. a connection to an
+      MLMD gRPC server.
 
   Raises:
     ValueError: If `full_pipeline` does not contain a pipeline run id, and
@@ -517,8 +588,18 @@ def reuse_pipeline_run_artifacts(
     logging.info(
         'base_run_id not provided. '
         'Default to latest pipeline run: %s', base_run_id)
-  for node_id in nodes_to_reuse:
-    artifact_recycler.reuse_node_outputs(node_id, base_run_id)
+  if max_workers > 1 and len(nodes_to_reuse) > 1:
+    with futures.ThreadPoolExecutor(
+        max_workers=min(max_workers, len(nodes_to_reuse))) as executor:
+      # Consume the results so that the first exception, if any, is raised.
+      list(
+          executor.map(
+              functools.partial(
+                  artifact_recycler.reuse_node_outputs,
+                  base_run_id=base_run_id), nodes_to_reuse))
+  else:
+    for node_id in nodes_to_reuse:
+      artifact_recycler.reuse_node_outputs(node_id, base_run_id)
   artifact_recycler.put_parent_context(base_run_id)
 
 
@@ -528,6 +609,8 @@ class _ArtifactRecycler:
   By implementing this in a class (instead of a function), we reduce the
   number of MLMD reads when reusing the outputs of multiple nodes in the same
   pipeline run.
+
+  `reuse_node_outputs` may be called concurrently for different nodes.
   """
 
   def __init__(self, metadata_handler: metadata.Metadata, pipeline_name: str,
@@ -548,6 +631,13 @@ class _ArtifactRecycler:
         for run_ctx in self._mlmd.store.get_contexts_by_type(
             constants.PIPELINE_RUN_CONTEXT_TYPE_NAME)
     }
+    self._latest_previous_run_id: Optional[str] = None
+    # Successful executions of the pipeline, keyed by pipeline run id.
+    self._successful_run_executions: Dict[
+        str, List[metadata_store_pb2.Execution]] = {}
+    # Guards the registration of the new pipeline run context, which is shared
+    # by all nodes, so that it happens only once.
+    self._lock = threading.Lock()
 
   def _get_pipeline_context(self) -> metadata_store_pb2.Context:
     result = self._mlmd.store.get_context_by_type_and_name(
@@ -583,34 +673,35 @@ class _ArtifactRecycler:
         pipeline_run_id cannot be found in MLMD.
     """
     if run_id not in self._pipeline_run_contexts:
-      if register_if_not_found:
-        pipeline_run_context = context_lib.register_context_if_not_exists(
-            self._mlmd,
-            context_type_name=constants.PIPELINE_RUN_CONTEXT_TYPE_NAME,
-            context_name=run_id)
-        self._pipeline_run_contexts[run_id] = pipeline_run_context
-      else:
+      if not register_if_not_found:
         raise LookupError(f'pipeline_run_id {run_id} not found in MLMD.')
+      with self._lock:
+        if run_id not in self._pipeline_run_contexts:
+          pipeline_run_context = context_lib.register_context_if_not_exists(
+              self._mlmd,
+              context_type_name=constants.PIPELINE_RUN_CONTEXT_TYPE_NAME,
+              context_name=run_id)
+          self._pipeline_run_contexts[run_id] = pipeline_run_context
     return self._pipeline_run_contexts[run_id]
 
   def get_latest_pipeline_run_id(self) -> str:
     """Gets the latest previous pipeline_run_id."""
-    latest_previous_run_ctx = None  # type: metadata_store_pb2.Context
-    for pipeline_run_context in self._pipeline_run_contexts.values():
-      if pipeline_run_context.name == self._new_run_id:
-        continue
-      if not latest_previous_run_ctx:
-        latest_previous_run_ctx = pipeline_run_context
-        continue
-      if (pipeline_run_context.create_time_since_epoch >
-          latest_previous_run_ctx.create_time_since_epoch):
-        latest_previous_run_ctx = pipeline_run_context
-    if not latest_previous_run_ctx:
-      raise LookupError(
-          'No previous pipeline_run_ids found. '
-          'You need to have completed a pipeline run before performing a '
-          'partial run with artifact reuse.')
-    return latest_previous_run_ctx.name
+    # The only context that can be added to self._pipeline_run_contexts after
+    # __init__ is the new run's, which is excluded here, so the result can be
+    # computed once.
+    if self._latest_previous_run_id is None:
+      latest_previous_run_ctx = max(
+          (run_ctx for run_ctx in self._pipeline_run_contexts.values()
+           if run_ctx.name != self._new_run_id),
+          key=lambda run_ctx: run_ctx.create_time_since_epoch,
+          default=None)
+      if latest_previous_run_ctx is None:
+        raise LookupError(
+            'No previous pipeline_run_ids found. '
+            'You need to have completed a pipeline run before performing a '
+            'partial run with artifact reuse.')
+      self._latest_previous_run_id = latest_previous_run_ctx.name
+    return self._latest_previous_run_id
 
   def _get_node_context(self, node_id: str) -> metadata_store_pb2.Context:
     node_context_name = compiler_utils.node_context_name(
@@ -622,6 +713,31 @@ class _ArtifactRecycler:
       raise LookupError(f'node context {node_context_name} not found in MLMD.')
     return result
 
+  def _get_successful_run_executions(
+      self, run_id: str) -> List[metadata_store_pb2.Execution]:
+    """Gets the successful Executions of this pipeline in a given pipeline run.
+
+    The executions shared by the pipeline run context and the pipeline context
+    are the same for every node, so they are queried once per run_id and then
+    narrowed down per node by `_get_successful_executions`.
+
+    Args:
+      run_id: The pipeline run id to query the Executions from.
+
+    Returns:
+      All successful executions of the pipeline at that run_id.
+    """
+    # Nodes reused concurrently may both miss and query MLMD, but they store
+    # the same result, so no lock is needed.
+    if run_id not in self._successful_run_executions:
+      base_run_context = self._get_pipeline_run_context(run_id)
+      self._successful_run_executions[run_id] = [
+          e for e in execution_lib.get_executions_associated_with_all_contexts(
+              self._mlmd, contexts=[base_run_context, self._pipeline_context])
+          if execution_lib.is_execution_successful(e)
+      ]
+    return self._successful_run_executions[run_id]
+
   def _get_successful_executions(
       self, node_id: str, run_id: str) -> List[metadata_store_pb2.Execution]:
     """Gets all successful Executions of a given node in a given pipeline run.
@@ -637,14 +753,12 @@ class _ArtifactRecycler:
       LookupError: If no successful Execution was found.
     """
     node_context = self._get_node_context(node_id)
-    base_run_context = self._get_pipeline_run_context(run_id)
-    all_associated_executions = (
-        execution_lib.get_executions_associated_with_all_contexts(
-            self._mlmd,
-            contexts=[node_context, base_run_context, self._pipeline_context]))
+    node_execution_ids = set(
+        e.id for e in self._mlmd.store.get_executions_by_context(
+            node_context.id))
     prev_successful_executions = [
-        e for e in all_associated_executions
-        if execution_lib.is_execution_successful(e)
+        e for e in self._get_successful_run_executions(run_id)
+        if e.id in node_execution_ids
     ]
     if not prev_successful_executions:
       raise LookupError(
@@ -679,43 +793,70 @@ class _ArtifactRecycler:
       result.append(context)
     return result
 
-  def _cache_and_publish(self,
-                         existing_execution: metadata_store_pb2.Execution):
-    """Updates MLMD."""
-    cached_execution_contexts = self._get_cached_execution_contexts(
-        existing_execution)
+  def _get_or_register_cached_execution(
+      self, existing_execution: metadata_store_pb2.Execution,
+      cached_execution_contexts: Sequence[metadata_store_pb2.Context]
+  ) -> Optional[metadata_store_pb2.Execution]:
+    """Gets the execution to publish as the cached copy of an execution.
+
+    Args:
+      existing_execution: The existing execution to copy from.
+      cached_execution_contexts: The Contexts of the cached copy, as returned
+        by `_get_cached_execution_contexts`.
+
+    Returns:
+      The previous attempt to cache existing_execution if there is one, or a
+      newly registered execution otherwise. None if existing_execution has
+      already been cached and published.
+    """
     # Check if there are any previous attempts to cache and publish.
     prev_cache_executions = (
         execution_lib.get_executions_associated_with_all_contexts(
             self._mlmd, contexts=cached_execution_contexts))
     if not prev_cache_executions:
-      new_execution = execution_publish_utils.register_execution(
+      return execution_publish_utils.register_execution(
           self._mlmd,
           execution_type=metadata_store_pb2.ExecutionType(
               id=existing_execution.type_id),
           contexts=cached_execution_contexts)
-    else:
-      if len(prev_cache_executions) > 1:
-        logging.warning(
-            'More than one previous cache executions seen when attempting '
-            'reuse_node_outputs: %s', prev_cache_executions)
-
-      if (prev_cache_executions[-1].last_known_state ==
-          metadata_store_pb2.Execution.CACHED):
-        return
-      else:
-        new_execution = prev_cache_executions[-1]
+
+    if len(prev_cache_executions) > 1:
+      logging.warning(
+          'More than one previous cache executions seen when attempting '
+          'reuse_node_outputs: %s', prev_cache_executions)
+
+    if (prev_cache_executions[-1].last_known_state ==
+        metadata_store_pb2.Execution.CACHED):
+      return None
+    return prev_cache_executions[-1]
+
+  def _cache_and_publish(self,
+                         existing_execution: metadata_store_pb2.Execution):
+    """Updates MLMD.
+
+    Args:
+      existing_execution: The existing execution to copy from.
+    """
+    cached_execution_contexts = self._get_cached_execution_contexts(
+        existing_execution)
+    new_execution = self._get_or_register_cached_execution(
+        existing_execution, cached_execution_contexts)
+    if new_execution is None:
+      return
 
     output_artifacts = execution_lib.get_artifacts_dict(
         self._mlmd,
         existing_execution.id,
         event_type=metadata_store_pb2.Event.OUTPUT)
 
+    # new_execution was just registered or read from MLMD, so there is no need
+    # for publish_cached_execution to read it back by id.
     execution_publish_utils.publish_cached_execution(
         self._mlmd,
         contexts=cached_execution_contexts,
         execution_id=new_execution.id,
-        output_artifacts=output_artifacts)
+        output_artifacts=output_artifacts,
+        execution=new_execution)
 
   def put_parent_context(self, base_run_id: str):
     """Puts a ParentContext edge in MLMD.
@@ -734,5 +875,7 @@ class _ArtifactRecycler:
   def reuse_node_outputs(self, node_id: str, base_run_id: str):
     """Makes the outputs of `node_id` available to new_pipeline_run_id."""
     previous_executions = self._get_successful_executions(node_id, base_run_id)
-    for previous_execution in previous_executions:
-      self._cache_and_publish(previous_execution)
+    # The cached copies of all executions of a node share the same contexts,
+    # so the copy of the newest execution is the only one that is published.
+    # Copying the older executions would only find that copy again.
+    self._cache_and_publish(previous_executions[0])
@@ -13,6 +13,7 @@
 # limitations under the License.
 """Tests for tfx.orchestration.portable.partial_run_utils."""
 
+from concurrent import futures
 from typing import List, Mapping, Optional, Tuple, Union
 from unittest import mock
 
@@ -857,6 +858,86 @@ class PartialRunTest(absltest.TestCase):
     beam_dag_runner.BeamDagRunner().run(filtered_pipeline_pb_run_2)
     self.assertResultEqual(filtered_pipeline_pb_run_2, 6)
 
+  def testReusePipelineRunArtifacts_maxWorkers(self):
+    """Tests that nodes are reused from a thread pool of max_workers threads."""
+    load = Load(start_num=1)  # pylint: disable=no-value-for-parameter
+    add_num = AddNum(to_add=1, num=load.outputs['num'])  # pylint: disable=no-value-for-parameter
+    result = Result(result=add_num.outputs['added_num'])
+    pipeline_pb_run_1 = self.make_pipeline(
+        components=[load, add_num, result], run_id='run_1')
+    beam_dag_runner.BeamDagRunner().run(pipeline_pb_run_1)
+
+    # Only rerun `Result`, so that both `Load` and `AddNum` are reused.
+    pipeline_pb_run_2 = self.make_pipeline(
+        components=[load, add_num, result], run_id='run_2')
+    filtered_pipeline_pb_run_2, excluded_direct_deps_run_2 = (
+        partial_run_utils.filter_pipeline(
+            pipeline_pb_run_2,
+            from_nodes=lambda node_id: (node_id == result.id)))
+
+    with metadata.Metadata(self.metadata_config) as m:
+      # The sqlite connection used here can't be shared across threads, so the
+      # per-node reuse itself is mocked out.
+      with mock.patch.object(
+          partial_run_utils._ArtifactRecycler,
+          'reuse_node_outputs',
+          autospec=True) as mock_reuse_node_outputs, mock.patch.object(
+              futures, 'ThreadPoolExecutor',
+              wraps=futures.ThreadPoolExecutor) as mock_executor:
+        partial_run_utils.reuse_pipeline_run_artifacts(
+            m,
+            full_pipeline=pipeline_pb_run_2,
+            filtered_pipeline=filtered_pipeline_pb_run_2,
+            excluded_direct_dependencies=excluded_direct_deps_run_2,
+            base_run_id='run_1',
+            max_workers=2)
+    mock_executor.assert_called_once_with(max_workers=2)
+    mock_reuse_node_outputs.assert_has_calls(
+        [
+            mock.call(mock.ANY, load.id, base_run_id='run_1'),
+            mock.call(mock.ANY, add_num.id, base_run_id='run_1'),
+        ],
+        any_order=True)
+    self.assertEqual(2, mock_reuse_node_outputs.call_count)
+
+  def testReusePipelineRunArtifacts_queriesBaseRunOnce(self):
+    """Tests that the base run executions are fetched once for all nodes."""
+    load = Load(start_num=1)  # pylint: disable=no-value-for-parameter
+    add_num = AddNum(to_add=1, num=load.outputs['num'])  # pylint: disable=no-value-for-parameter
+    result = Result(result=add_num.outputs['added_num'])
+    pipeline_pb_run_1 = self.make_pipeline(
+        components=[load, add_num, result], run_id='run_1')
+    beam_dag_runner.BeamDagRunner().run(pipeline_pb_run_1)
+
+    # Only rerun `Result`, so that both `Load` and `AddNum` are reused.
+    pipeline_pb_run_2 = self.make_pipeline(
+        components=[load, add_num, result], run_id='run_2')
+    filtered_pipeline_pb_run_2, excluded_direct_deps_run_2 = (
+        partial_run_utils.filter_pipeline(
+            pipeline_pb_run_2,
+            from_nodes=lambda node_id: (node_id == result.id)))
+
+    with metadata.Metadata(self.metadata_config) as m:
+      base_run_context = m.store.get_context_by_type_and_name(
+          type_name=constants.PIPELINE_RUN_CONTEXT_TYPE_NAME,
+          context_name='run_1')
+      with mock.patch.object(
+          m.store,
+          'get_executions_by_context',
+          wraps=m.store.get_executions_by_context) as mock_get_executions:
+        partial_run_utils.reuse_pipeline_run_artifacts(
+            m,
+            full_pipeline=pipeline_pb_run_2,
+            filtered_pipeline=filtered_pipeline_pb_run_2,
+            excluded_direct_dependencies=excluded_direct_deps_run_2,
+            base_run_id='run_1')
+      self.assertEqual(1, [
+          call_args[0][0] for call_args in mock_get_executions.call_args_list
+      ].count(base_run_context.id))
+
+    beam_dag_runner.BeamDagRunner().run(filtered_pipeline_pb_run_2)
+    self.assertResultEqual(filtered_pipeline_pb_run_2, 2)
+
   def testReusePipelineArtifacts_twoIndependentSubgraphs(self):
     """Tests a sequence of partial runs with independent sub-graphs."""
     ############################################################################
@@ -1593,6 +1674,78 @@ class PartialRunTest(absltest.TestCase):
     beam_dag_runner.BeamDagRunner().run(pipeline_pb_run_2)
     self.assertResultEqual(pipeline_pb_run_2, 6)
 
+  def testReuseNodeOutputs_multipleSuccessfulExecutions(self):
+    """Only the newest successful execution of a node is published once."""
+    # Run `Load` twice in run_1, with different outputs.
+    load = Load(start_num=1)  # pylint: disable=no-value-for-parameter
+    add_num = AddNum(to_add=1, num=load.outputs['num'])  # pylint: disable=no-value-for-parameter
+    result = Result(result=add_num.outputs['added_num'])
+    beam_dag_runner.BeamDagRunner().run(
+        self.make_pipeline(components=[load, add_num, result], run_id='run_1'))
+    load_v2 = Load(start_num=3)  # pylint: disable=no-value-for-parameter
+    add_num_v2 = AddNum(to_add=1, num=load_v2.outputs['num'])  # pylint: disable=no-value-for-parameter
+    result_v2 = Result(result=add_num_v2.outputs['added_num'])
+    beam_dag_runner.BeamDagRunner().run(
+        self.make_pipeline(
+            components=[load_v2, add_num_v2, result_v2], run_id='run_1'))
+
+    add_num_v3 = AddNum(to_add=5, num=load_v2.outputs['num'])  # pylint: disable=no-value-for-parameter
+    load_v2.remove_downstream_node(add_num_v2)  # This line is important.
+    result_v3 = Result(result=add_num_v3.outputs['added_num'])
+    pipeline_pb_run_2 = self.make_pipeline(
+        components=[load_v2, add_num_v3, result_v3], run_id='run_2')
+    pipeline_pb_run_2, _ = partial_run_utils.filter_pipeline(
+        pipeline_pb_run_2,
+        from_nodes=lambda node_id: (node_id == add_num_v3.id))
+
+    with metadata.Metadata(self.metadata_config) as m:
+      node_context = m.store.get_context_by_type_and_name(
+          type_name=constants.NODE_CONTEXT_TYPE_NAME,
+          context_name=compiler_utils.node_context_name(
+              self.pipeline_name, load.id))
+      base_run_executions = (
+          execution_lib.get_executions_associated_with_all_contexts(
+              m,
+              contexts=[
+                  node_context,
+                  m.store.get_context_by_type_and_name(
+                      type_name=constants.PIPELINE_RUN_CONTEXT_TYPE_NAME,
+                      context_name='run_1'),
+              ]))
+      self.assertLen(base_run_executions, 2)
+      [newest_execution, _] = execution_lib.sort_executions_newest_to_oldest(
+          base_run_executions)
+
+      partial_run_utils.reuse_node_outputs(
+          m,
+          pipeline_name=self.pipeline_name,
+          node_id=load.id,
+          base_run_id='run_1',
+          new_run_id='run_2')
+
+      [new_cache_execution] = (
+          execution_lib.get_executions_associated_with_all_contexts(
+              m,
+              contexts=[
+                  node_context,
+                  m.store.get_context_by_type_and_name(
+                      type_name=constants.PIPELINE_RUN_CONTEXT_TYPE_NAME,
+                      context_name='run_2'),
+              ]))
+      self.assertEqual(metadata_store_pb2.Execution.CACHED,
+                       new_cache_execution.last_known_state)
+      # The cached execution only has the outputs of the newest execution.
+      self.assertCountEqual(
+          execution_lib.get_artifact_ids_by_event_type_for_execution_id(
+              m, newest_execution.id)[metadata_store_pb2.Event.OUTPUT],
+          [
+              event.artifact_id for event in
+              m.store.get_events_by_execution_ids([new_cache_execution.id])
+          ])
+
+    beam_dag_runner.BeamDagRunner().run(pipeline_pb_run_2)
+    self.assertResultEqual(pipeline_pb_run_2, 8)
+
   def testReusePipelineArtifacts_missingNewRunId_error(self):
     """If pipeline IR has no run id, and user does not provide it, fail."""
     ############################################################################